@@ -4,22 +4,32 @@ AAP Log Generator - Mock Ansible Automation Platform logs for testing
 """
 
 import asyncio
-import json
+import atexit
+import bisect
+import codecs
+import itertools
 import logging
+import logging.handlers
 import os
 import random
 import re
+import sys
 import time
 import uuid
-from datetime import datetime, timezone
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union
+from typing import Coroutine, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Any, Union
 import threading
 import queue
 
+import orjson
 import uvicorn
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Query
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
 import requests
 
@@ -54,10 +64,66 @@ aap_logger = logging.getLogger('aap_mock')
 aap_logger.setLevel(logging.INFO)
 aap_logger.propagate = False  # Don't propagate to root logger
 
+class BufferedStreamHandler(logging.StreamHandler):
+    """StreamHandler that collects records and writes them in one batch on flush()"""
+    
+    def __init__(self, stream=None, capacity: int = 512):
+        super().__init__(stream)
+        self.capacity = capacity
+        self.buffer: List[str] = []
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.buffer.append(self.format(record) + self.terminator)
+            if len(self.buffer) >= self.capacity:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+    
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                self.stream.write("".join(self.buffer))
+                self.buffer.clear()
+            super().flush()
+        finally:
+            self.release()
+
+class StructuredAAPQueueListener(logging.handlers.QueueListener):
+    """QueueListener that converts each record to structured AAP format.
+    
+    Runs in the listener thread, once per record for all handlers, so the
+    replay loop only has to enqueue the raw line.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Stamp with the record's creation time, not the time it was dequeued
+        record.msg = _normalize_to_structured_aap_format(record.getMessage(), record.created)
+        record.args = None
+        return record
+
+def _flush_periodically(handlers: List[logging.Handler], interval: float):
+    """Flush buffered handlers every interval seconds (daemon thread body)"""
+    while True:
+        time.sleep(interval)
+        for handler in handlers:
+            handler.flush()
+
 # Stdout handler for AAP mock logs (what Alloy collects)
-aap_stdout_handler = logging.StreamHandler()
+# When stdout is a pipe (Kubernetes), lines are batched and flushed every 100ms
+# so replay bursts cost one write per batch instead of one per line; an
+# interactive terminal keeps per-line output for local development.
+if sys.stdout.isatty():
+    aap_stdout_handler = logging.StreamHandler(sys.stdout)
+else:
+    aap_stdout_handler = BufferedStreamHandler(sys.stdout)
 aap_stdout_handler.setFormatter(logging.Formatter('%(message)s'))  # Raw format - already structured
-aap_logger.addHandler(aap_stdout_handler)
+
+# Records are handed to a background listener through a queue, so replay
+# threads never block on stdout themselves
+aap_log_queue = queue.Queue(-1)
+aap_logger.addHandler(logging.handlers.QueueHandler(aap_log_queue))
 
 # For backward compatibility with existing code
 logger = app_logger
@@ -70,14 +136,67 @@ AUTO_LOAD_DIR = Path("/app/sample-logs")  # New: auto-load directory
 OUTPUT_LOG_DIR = Path("/var/log/aap-mock")
 OUTPUT_LOG_FILE = OUTPUT_LOG_DIR / "output.log"
 
+# Worker processes for parsing auto-loaded files. Kept small: os.cpu_count()
+# reports the node's cores rather than the pod's CPU quota, and every worker
+# is a full interpreter counted against the pod's memory limit
+_available_cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+PARSE_WORKERS = int(os.getenv("AAP_MOCK_PARSE_WORKERS", min(4, _available_cpus)))
+
 # Ensure directories exist
 for dir_path in [UPLOADS_DIR, GENERATED_DIR, AUTO_LOAD_DIR, OUTPUT_LOG_DIR]:
     dir_path.mkdir(parents=True, exist_ok=True)
 
+# OPTIONAL: AAP mock logs also go to OUTPUT_LOG_FILE for backward compatibility /
+# local debugging when AAP_MOCK_WRITE_FILE=1. In production stdout is the only
+# sink. The file is opened once and batched like stdout instead of being
+# reopened for every line.
+WRITE_OUTPUT_FILE = os.getenv("AAP_MOCK_WRITE_FILE", "0") == "1"
+aap_handlers: List[logging.Handler] = [aap_stdout_handler]
+if WRITE_OUTPUT_FILE:
+    try:
+        aap_file_handler = BufferedStreamHandler(open(OUTPUT_LOG_FILE, "a", buffering=1 << 16))
+        aap_file_handler.setFormatter(logging.Formatter('%(message)s'))
+        aap_handlers.append(aap_file_handler)
+    except OSError as e:
+        # Missing or read-only log directory: keep serving with stdout only
+        logger.warning(f"⚠️  Cannot open {OUTPUT_LOG_FILE}, replayed logs go to stdout only: {e}")
+
+aap_log_listener = StructuredAAPQueueListener(aap_log_queue, *aap_handlers)
+aap_log_listener.start()
+threading.Thread(
+    target=_flush_periodically, args=(aap_handlers, 0.1),
+    name="aap-log-flush", daemon=True
+).start()
+
+def _stop_aap_logging():
+    """Drain queued records and flush them out before the interpreter exits"""
+    aap_log_listener.stop()
+    for handler in aap_handlers:
+        handler.flush()
+
+atexit.register(_stop_aap_logging)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Auto-load sample logs and run the OTLP exporter for the app's lifetime;
+    on shutdown stop any replays still running, then flush and close the exporter"""
+    # Loaded here rather than before uvicorn.run so every worker process
+    # (WEB_CONCURRENCY > 1) starts with the sample jobs
+    auto_load_sample_logs()
+    _start_otlp_exporter()
+    yield
+    for event in list(active_stop_events):
+        event.set()
+    if replay_tasks:
+        await asyncio.wait(list(replay_tasks), timeout=5)
+    await asyncio.get_running_loop().run_in_executor(None, _stop_otlp_exporter)
+
 app = FastAPI(
     title="AAP Log Generator",
     description="Mock Ansible Automation Platform logs for testing",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Global replay state and stop mechanism
@@ -87,17 +206,34 @@ replay_state = {
     "current_job": None
 }
 
-# CRITICAL FIX: Global stop flag that persists even when state gets corrupted
-global_stop_flag = threading.Event()  # This persists across state resets
+# CRITICAL FIX: Every replay's stop event is tracked here, independently of
+# replay_state (which per-file cleanup resets), so a stop always reaches it.
+# Events drop out on their own once a finished replay no longer holds them.
+active_stop_events: "weakref.WeakSet[threading.Event]" = weakref.WeakSet()
+replay_tasks: "Set[asyncio.Task]" = set()  # Running replay tasks
 
 # AAP-compatible job storage
 aap_jobs_db = {}  # job_id -> job_data
-aap_job_events_db = {}  # job_id -> [events]
+aap_job_events_db = {}  # job_id -> JobEventColumns
+aap_jobs_list: List[Dict[str, Any]] = []  # jobs in aap_jobs_db order, for page slicing
+aap_job_positions: Dict[int, int] = {}  # job_id -> index in aap_jobs_list
+# Each stored job's events get a contiguous id range: first ids (ascending) and
+# the job each range was stored under, so an event id is found by bisection
+aap_event_id_starts: List[int] = []
+aap_event_id_jobs: List[int] = []
 aap_next_job_id = 1
 aap_next_event_id = 1
+aap_store_lock = threading.Lock()  # Serializes _store_aap_job
 
 # Auto-loaded files storage
 auto_loaded_files = {}  # filename -> file_path
+_auto_loaded_meta = {}  # file_path -> (size, mtime_ns) when it was loaded
+
+# Shared random generator for synthetic logs and replay jitter
+_rng = random.Random()
+
+# Uploaded files, newest first; rebuilt only when the directory mtime changes
+_uploads_cache = {"dir_mtime_ns": None, "files": []}
 
 # Pydantic models
 class GenerateLogsRequest(BaseModel):
@@ -128,6 +264,14 @@ class StatusResponse(BaseModel):
     active: bool
     current_job: Optional[Dict[str, Any]] = None
 
+def _model_response(model: BaseModel) -> Response:
+    """JSON response straight from pydantic's compiled serializer.
+    
+    Skips FastAPI re-validating and re-encoding a model we just built;
+    the route's response_model still documents the schema.
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
 # AAP-compatible response models
 class AAPJobResponse(BaseModel):
     id: int
@@ -178,8 +322,107 @@ class AAPListResponse(BaseModel):
     previous: Optional[str] = None
     results: List[Dict[str, Any]]
 
+class JobEventColumns:
+    """Job events stored as parallel per-field lists (one entry per event).
+    
+    Only the fields that vary per event are kept; full AAP event dicts are
+    built on demand for the events actually returned by the API.
+    """
+    
+    def __init__(self):
+        self.id: List[int] = []
+        self.event: List[str] = []
+        self.event_display: List[str] = []
+        self.failed: List[bool] = []
+        self.changed: List[bool] = []
+        self.uuid: List[str] = []
+        self.host: List[Optional[str]] = []
+        self.task: List[Optional[str]] = []
+        self.stdout: List[str] = []
+        self.line_number: List[int] = []
+        self.created: List[str] = []
+        # (event count, joined stdout) - recomputed once more events are appended
+        self._stdout_cache = (0, "")
+    
+    def __len__(self) -> int:
+        return len(self.id)
+    
+    def append(self, event_id: int, event_uuid: str, event_data: Dict[str, Any]):
+        """Append a parsed log line (see parse_aap_log_line) as a new event"""
+        self.id.append(event_id)
+        self.event.append(event_data["event_type"])
+        self.event_display.append(event_data["event_display"])
+        self.failed.append(event_data["failed"])
+        self.changed.append(event_data["changed"])
+        self.uuid.append(event_uuid)
+        self.host.append(event_data["host"])
+        self.task.append(event_data["task"])
+        self.stdout.append(event_data["stdout"])
+        self.line_number.append(event_data["line_number"])
+        self.created.append(event_data["timestamp"])
+    
+    def row(self, index: int) -> Dict[str, Any]:
+        """Build the AAP job event dict for the event at index"""
+        event_id = self.id[index]
+        host = self.host[index]
+        task = self.task[index]
+        stdout = self.stdout[index]
+        line_number = self.line_number[index]
+        created = self.created[index]
+        return {
+            "id": event_id,
+            "event": self.event[index],
+            "counter": index + 1,
+            "event_display": self.event_display[index],
+            "event_data": {
+                "res": {"stdout": stdout} if stdout else {},
+                "task": task,
+                "task_args": "",
+                "task_action": task if task else "",
+                "host": host
+            },
+            "event_level": 3,
+            "failed": self.failed[index],
+            "changed": self.changed[index],
+            "uuid": self.uuid[index],
+            "parent_uuid": None,
+            "host": host,
+            "host_name": host,
+            "playbook": "main.yml",
+            "play": "Deploy Application",
+            "task": task,
+            "role": None,
+            "stdout": stdout,
+            "start_line": line_number,
+            "end_line": line_number,
+            "verbosity": 0,
+            "created": created,
+            "modified": created,
+            "url": f"/api/v2/job_events/{event_id}/"
+        }
+    
+    def rows(self, start: int, end: int) -> List[Dict[str, Any]]:
+        """Build AAP job event dicts for events[start:end]"""
+        return [self.row(i) for i in range(start, min(end, len(self)))]
+    
+    def stdout_text(self) -> str:
+        """Stdout of every event (falling back to its display text), one per line"""
+        count, text = self._stdout_cache
+        if count != len(self):
+            text = "\n".join(stdout or display for stdout, display in zip(self.stdout, self.event_display))
+            self._stdout_cache = (len(self), text)
+        return text
+
 def auto_load_sample_logs():
     """Auto-load log files from the sample-logs directory on startup"""
+    # Files loaded by a previous scan and unchanged since (same size and
+    # mtime) keep their registration and AAP job instead of being re-parsed
+    previous_files = dict(auto_loaded_files)
+    previous_meta = dict(_auto_loaded_meta)
+    auto_loaded_files.clear()
+    _auto_loaded_meta.clear()
+    unchanged_count = 0
+    
     if not AUTO_LOAD_DIR.exists():
         logger.info(f"Auto-load directory {AUTO_LOAD_DIR} does not exist, skipping auto-load")
         return
@@ -191,29 +434,61 @@ def auto_load_sample_logs():
     
     logger.info(f"🔍 Scanning {AUTO_LOAD_DIR} for log files to auto-load...")
     
-    for file_path in AUTO_LOAD_DIR.iterdir():
-        if file_path.is_file() and file_path.suffix.lower() in supported_extensions:
+    # Collect candidate files first so they can be parsed in parallel
+    candidates = []  # (file_path, (size, mtime_ns), unchanged)
+    with os.scandir(AUTO_LOAD_DIR) as entries:
+        for entry in entries:
+            file_path = Path(entry.path)
+            if not (entry.is_file() and file_path.suffix.lower() in supported_extensions):
+                continue
             try:
                 # Check file size first
-                file_size = file_path.stat().st_size
-                if file_size == 0:
+                stat = entry.stat()
+                if stat.st_size == 0:
                     logger.warning(f"⚠️  Skipping empty file: {file_path.name} (0 bytes)")
                     skipped_count += 1
                     continue
-                
-                # Read file content
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                
-                # Check for meaningful content (not just whitespace)
-                if not content.strip():
-                    logger.warning(f"⚠️  Skipping file with only whitespace: {file_path.name}")
-                    skipped_count += 1
-                    continue
-                
-                # Count actual lines with content
-                lines = [line.strip() for line in content.split('\n') if line.strip()]
-                if len(lines) == 0:
+                signature = (stat.st_size, stat.st_mtime_ns)
+                unchanged = (previous_files.get(file_path.stem) == entry.path
+                             and previous_meta.get(entry.path) == signature)
+                candidates.append((file_path, signature, unchanged))
+            except Exception as e:
+                logger.warning(f"❌ Failed to auto-load {file_path.name}: {e}")
+                skipped_count += 1
+    
+    # Parsing is CPU-bound, so several files are spread across worker processes;
+    # the jobs are still registered here, in directory order. Files the pool
+    # can't take (or loses to a dead worker) are parsed in this process instead.
+    to_parse = [file_path for file_path, _, unchanged in candidates if not unchanged]
+    workers = min(len(to_parse), PARSE_WORKERS)
+    executor = None
+    futures = {}
+    try:
+        if workers > 1:
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers)
+                for file_path in to_parse:
+                    futures[file_path] = executor.submit(_parse_log_file, file_path)
+            except (OSError, BrokenProcessPool) as e:
+                logger.warning(f"⚠️  Parallel parsing unavailable, parsing remaining files serially: {e}")
+        
+        for file_path, signature, unchanged in candidates:
+            if unchanged:
+                auto_loaded_files[file_path.stem] = str(file_path)
+                _auto_loaded_meta[str(file_path)] = signature
+                unchanged_count += 1
+                continue
+            
+            try:
+                future = futures.get(file_path)
+                parsed = None
+                if future:
+                    try:
+                        parsed = future.result()
+                    except BrokenProcessPool:
+                        logger.warning(f"⚠️  Parse worker died, parsing {file_path.name} serially")
+                lines_count, job_id, events = parsed or _parse_log_file(file_path)
+                if lines_count == 0:
                     logger.warning(f"⚠️  Skipping file with no content lines: {file_path.name}")
                     skipped_count += 1
                     continue
@@ -223,20 +498,27 @@ def auto_load_sample_logs():
                 
                 # Store in auto-loaded files registry
                 auto_loaded_files[filename_key] = str(file_path)
+                _auto_loaded_meta[str(file_path)] = signature
                 
-                # Parse into AAP job format
-                job_id = create_aap_job_from_log(content, file_path.name)
+                # Store as AAP job
+                job_id = _store_aap_job(job_id, events, file_path.name)
                 
-                logger.info(f"✅ Auto-loaded: {file_path.name} → AAP job {job_id} (key: {filename_key}) - {len(lines)} lines")
+                logger.info(f"✅ Auto-loaded: {file_path.name} → AAP job {job_id} (key: {filename_key}) - {lines_count} lines")
                 loaded_count += 1
                 
             except Exception as e:
                 logger.warning(f"❌ Failed to auto-load {file_path.name}: {e}")
                 skipped_count += 1
+    finally:
+        if executor:
+            executor.shutdown()
     
     # Summary report
+    if unchanged_count > 0:
+        logger.info(f"♻️  Kept {unchanged_count} unchanged log files without re-parsing")
     if loaded_count > 0:
         logger.info(f"🎉 Successfully auto-loaded {loaded_count} log files")
+    if auto_loaded_files:
         logger.info(f"📋 Available for replay: {list(auto_loaded_files.keys())}")
     else:
         logger.info("📂 No valid log files found in sample-logs directory")
@@ -244,42 +526,108 @@ def auto_load_sample_logs():
     if skipped_count > 0:
         logger.info(f"⚠️  Skipped {skipped_count} invalid/empty files")
         
-    if loaded_count == 0 and skipped_count == 0:
+    if not auto_loaded_files and skipped_count == 0:
         logger.info(f"💡 Drop .log or .txt files in {AUTO_LOAD_DIR} to auto-load them!")
 
+def _parse_log_file(file_path: Path) -> Tuple[int, Optional[int], JobEventColumns]:
+    """Parse a log file into (content lines, job_id, events) - runs in a worker process"""
+    # Stream the file in a single pass instead of reading it into memory; every
+    # line with content (not just whitespace) becomes exactly one event
+    with open(file_path, 'r', encoding='utf-8', errors='ignore', buffering=1 << 20) as f:
+        job_id, events = _parse_log_events(f)
+    
+    return len(events), job_id, events
+
+# AAP log parsing patterns (compiled once, used per line)
+_STRUCTURED_RE = re.compile(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{3}Z)\s+(\w+)\s+\[([^\]]+)\]\s+(.*)')
+_JOBID_RE = re.compile(r'job_(\d+)')
+_TASK_RE = re.compile(r"TASK \[([^\]]+)\]")
+_PLAY_RE = re.compile(r'PLAY \[([^\]]+)\]')
+_RESULT_RE = re.compile(r'^(ok|changed|failed|fatal|unreachable|skipping):\s*\[([^\]]+)\](.*)')
+_SYSLOG_TS_RE = re.compile(r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})[,.]?\d*\s+(\w+)\s+(.*)')
+_JOB_NUM_RE = re.compile(r'[Jj]ob\s+(\d+)')
+_HOST_RES = [re.compile(p) for p in (
+    r'\[([a-zA-Z0-9.-]+)\]',  # [hostname]
+    r'host[:\s]+([a-zA-Z0-9.-]+)',  # host: hostname
+    r'on\s+([a-zA-Z0-9.-]+)'  # on hostname
+)]
+_AWX_SYSLOG_RE = re.compile(r'(\w+\s+\d+\s+\d{2}:\d{2}:\d{2})\s+([^\s]+)\s+([^:]+):\s*(.*)')
+_AWX_JOB_RE = re.compile(r'[Jj]ob\s*[:#]?\s*(\d+)')
+# Task lifecycle keywords in priority order: (substring, event_type, changed)
+_STRUCTURED_KEYWORD_EVENTS = (
+    ("started", "runner_on_start", False),
+    ("running", "runner_on_start", False),
+    ("completed successfully", "runner_on_ok", True),
+    ("failed", "runner_on_failed", False),
+)
+_LEVEL_KEYWORDS_RE = re.compile(r'ERROR|FAIL|FATAL|WARN|DEBUG')
+_ERROR_KEYWORDS = frozenset(["ERROR", "FAIL", "FATAL"])
+_SYSLOG_MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+
+# Combined format dispatch: each group is the leading part of one parser's pattern
+# and the formats are mutually exclusive, so one match selects the parser to run
+_DISPATCH_RE = re.compile(
+    r'(?P<structured>\d{4}-\d{2}-\d{2}T)'  # TIMESTAMP LEVEL [job_id:host] MESSAGE
+    r'|(?P<json>\{)'  # {"event": "runner_on_start", ...}
+    r'|(?P<ansible>PLAY \[|TASK \[|(?:ok|changed|failed|fatal|unreachable|skipping):\s*\[)'  # Raw ansible output
+    r'|(?P<system>\d{4}-\d{2}-\d{2}\s)'  # 2024-01-15 10:30:00 INFO Job started
+    r'|(?P<awx>\w+\s+\d+\s+\d{2}:\d{2}:\d{2}\s)'  # Jan 15 10:30:00 tower-01 awx-manage[1234]: ...
+)
+
 # AAP log parsing functions
-def parse_aap_log_line(line: str, line_number: int) -> Optional[Dict[str, Any]]:
-    """Parse a single AAP log line into job event format - supports multiple formats"""
+def parse_aap_log_line(line: str, line_number: int, now_iso: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Parse a single AAP log line into job event format - supports multiple formats
+    
+    now_iso is the timestamp used for lines that carry none of their own; batch
+    callers compute it once instead of per line.
+    """
     line = line.strip()
     if not line:
         return None
     
-    # Try multiple AAP log format patterns
-    parsers = [
-        _parse_structured_format,    # Our current format: TIMESTAMP LEVEL [job_id:host] MESSAGE  
-        _parse_json_format,          # AAP JSON event logs: {"event": "runner_on_start", ...}
-        _parse_ansible_output,       # Raw ansible output: "TASK [setup] ***", "ok: [host]"
-        _parse_aap_system_logs,      # AAP system logs: "2024-01-15 10:30:00 INFO Job started"
-        _parse_awx_logs             # AWX/Tower logs: various formats
-    ]
+    if now_iso is None:
+        now_iso = datetime.now(timezone.utc).isoformat()
     
-    for parser in parsers:
+    # Pick the only parser whose pattern can apply to this line
+    log_format = _dispatch_format(line)
+    if log_format:
+        parser = _FORMAT_PARSERS[log_format]
         try:
-            result = parser(line, line_number)
+            result = parser(line, line_number, now_iso)
             if result:
                 return result
         except Exception as e:
-            logger.debug(f"Parser {parser.__name__} failed for line {line_number}: {e}")
-            continue
+            logger.debug("Parser %s failed for line %d: %s", parser.__name__, line_number, e)
     
     # If no parser worked, create a generic log entry
-    logger.debug(f"No parser matched line {line_number}: {line[:100]}...")
-    return _create_generic_entry(line, line_number)
+    # Lazy %-formatting: nothing is formatted (or truncated) unless DEBUG is on
+    logger.debug("No parser matched line %d: %.100s...", line_number, line)
+    return _create_generic_entry(line, line_number, now_iso)
 
-def _parse_structured_format(line: str, line_number: int) -> Optional[Dict[str, Any]]:
+def _dispatch_format(line: str) -> Optional[str]:
+    """Return the _FORMAT_PARSERS key for a line, or None if no format applies"""
+    # Cheap prefix checks settle the common cases without running a regex
+    first_char = line[0]
+    if first_char == '{':
+        return "json"
+    if '0' <= first_char <= '9' and line[4:5] == '-':
+        # ISO structured (2024-01-15T...) vs system log (2024-01-15 10:30:00)
+        separator = line[10:11]
+        if separator == 'T':
+            return "structured"
+        if separator.isspace():
+            return "system"
+        return None
+    
+    dispatch = _DISPATCH_RE.match(line)
+    return dispatch.lastgroup if dispatch else None
+
+def _parse_structured_format(line: str, line_number: int, now_iso: str) -> Optional[Dict[str, Any]]:
     """Parse our current structured format: TIMESTAMP LEVEL [job_id:host] MESSAGE"""
-    pattern = r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{3}Z)\s+(\w+)\s+\[([^\]]+)\]\s+(.*)'
-    match = re.match(pattern, line)
+    match = _STRUCTURED_RE.match(line)
     
     if not match:
         return None
@@ -293,7 +641,7 @@ def _parse_structured_format(line: str, line_number: int) -> Optional[Dict[str,
         job_id_str, host = job_info, None
     
     # Extract job ID number
-    job_id_match = re.search(r'job_(\d+)', job_id_str)
+    job_id_match = _JOBID_RE.search(job_id_str)
     if not job_id_match:
         return None
     
@@ -306,26 +654,18 @@ def _parse_structured_format(line: str, line_number: int) -> Optional[Dict[str,
     stdout = ""
     failed = level == "ERROR"
     changed = False
-    
-    if "started" in message.lower():
-        event_type = "runner_on_start"
-        task_match = re.search(r"TASK \[([^\]]+)\]", message)
-        if task_match:
-            task_name = task_match.group(1)
-    elif "running" in message.lower():
-        event_type = "runner_on_start"
-        task_match = re.search(r"TASK \[([^\]]+)\]", message)
-        if task_match:
-            task_name = task_match.group(1)
-    elif "completed successfully" in message.lower():
-        event_type = "runner_on_ok"
-        task_match = re.search(r"TASK \[([^\]]+)\]", message)
-        if task_match:
-            task_name = task_match.group(1)
-        changed = True
-    elif "failed" in message.lower():
-        event_type = "runner_on_failed"
-        task_match = re.search(r"TASK \[([^\]]+)\]", message)
+    msg_lower = message.lower()
+    lifecycle = None
+    for keyword, keyword_event, keyword_changed in _STRUCTURED_KEYWORD_EVENTS:
+        if keyword in msg_lower:
+            lifecycle = keyword_event
+            changed = keyword_changed
+            break
+    
+    if lifecycle:
+        # Task lifecycle message: started/running > completed successfully > failed
+        event_type = lifecycle
+        task_match = _TASK_RE.search(message)
         if task_match:
             task_name = task_match.group(1)
     elif "stdout:" in message:
@@ -360,13 +700,13 @@ def _parse_structured_format(line: str, line_number: int) -> Optional[Dict[str,
         "message": message
     }
 
-def _parse_json_format(line: str, line_number: int) -> Optional[Dict[str, Any]]:
+def _parse_json_format(line: str, line_number: int, now_iso: str) -> Optional[Dict[str, Any]]:
     """Parse AAP JSON event logs: {"event": "runner_on_start", "counter": 1, ...}"""
     try:
         if not line.startswith('{'):
             return None
         
-        data = json.loads(line)
+        data = orjson.loads(line)
         
         # Extract job ID from various possible fields
         job_id = data.get('job_id') or data.get('job') or 1
@@ -379,7 +719,7 @@ def _parse_json_format(line: str, line_number: int) -> Optional[Dict[str, Any]]:
         
         return {
             "job_id": job_id,
-            "timestamp": data.get('created') or data.get('timestamp') or datetime.now(timezone.utc).isoformat(),
+            "timestamp": data.get('created') or data.get('timestamp') or now_iso,
             "event_type": data.get('event', 'runner_on_ok'),
             "event_display": data.get('event_display') or data.get('stdout', ''),
             "host": data.get('host') or data.get('host_name'),
@@ -391,19 +731,19 @@ def _parse_json_format(line: str, line_number: int) -> Optional[Dict[str, Any]]:
             "line_number": line_number,
             "message": data.get('event_display') or str(data)
         }
-    except (json.JSONDecodeError, KeyError, ValueError):
+    except (orjson.JSONDecodeError, KeyError, ValueError):
         return None
 
-def _parse_ansible_output(line: str, line_number: int) -> Optional[Dict[str, Any]]:
+def _parse_ansible_output(line: str, line_number: int, now_iso: str) -> Optional[Dict[str, Any]]:
     """Parse raw ansible playbook output"""
     
     # PLAY header
     if line.startswith('PLAY ['):
-        play_match = re.match(r'PLAY \[([^\]]+)\]', line)
+        play_match = _PLAY_RE.match(line)
         play_name = play_match.group(1) if play_match else "Unknown Play"
         return {
             "job_id": 1,  # Default job ID
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": now_iso,
             "event_type": "playbook_on_play_start",
             "event_display": f"PLAY [{play_name}]",
             "host": None,
@@ -418,11 +758,11 @@ def _parse_ansible_output(line: str, line_number: int) -> Optional[Dict[str, Any
     
     # TASK header
     elif line.startswith('TASK ['):
-        task_match = re.match(r'TASK \[([^\]]+)\]', line)
+        task_match = _TASK_RE.match(line)
         task_name = task_match.group(1) if task_match else "Unknown Task"
         return {
             "job_id": 1,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": now_iso,
             "event_type": "runner_on_start",
             "event_display": f"TASK [{task_name}]",
             "host": None,
@@ -436,8 +776,8 @@ def _parse_ansible_output(line: str, line_number: int) -> Optional[Dict[str, Any
         }
     
     # Task results: ok: [host], changed: [host], failed: [host]
-    elif re.match(r'^(ok|changed|failed|fatal|unreachable|skipping):\s*\[([^\]]+)\]', line):
-        result_match = re.match(r'^(ok|changed|failed|fatal|unreachable|skipping):\s*\[([^\]]+)\](.*)', line)
+    else:
+        result_match = _RESULT_RE.match(line)
         if result_match:
             status, host, extra = result_match.groups()
             
@@ -459,7 +799,7 @@ def _parse_ansible_output(line: str, line_number: int) -> Optional[Dict[str, Any
             
             return {
                 "job_id": 1,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": now_iso,
                 "event_type": event_type,
                 "event_display": line,
                 "host": host,
@@ -474,41 +814,34 @@ def _parse_ansible_output(line: str, line_number: int) -> Optional[Dict[str, Any
     
     return None
 
-def _parse_aap_system_logs(line: str, line_number: int) -> Optional[Dict[str, Any]]:
+def _parse_aap_system_logs(line: str, line_number: int, now_iso: str) -> Optional[Dict[str, Any]]:
     """Parse AAP system logs: 2024-01-15 10:30:00 INFO Job 123 started"""
     
     # Pattern: YYYY-MM-DD HH:MM:SS LEVEL MESSAGE
-    pattern = r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})[,.]?\d*\s+(\w+)\s+(.*)'
-    match = re.match(pattern, line)
+    match = _SYSLOG_TS_RE.match(line)
     
     if not match:
         return None
     
     timestamp_str, level, message = match.groups()
     
-    # Convert timestamp to ISO format
+    # Convert timestamp to ISO format (fromisoformat is C-accelerated, strptime is not)
     try:
-        dt = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-        dt = dt.replace(tzinfo=timezone.utc)
+        dt = datetime.fromisoformat(f"{timestamp_str[:10]}T{timestamp_str[-8:]}+00:00")
         timestamp = dt.isoformat()
     except ValueError:
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = now_iso
     
     # Extract job ID if present
     job_id = 1
-    job_match = re.search(r'[Jj]ob\s+(\d+)', message)
+    job_match = _JOB_NUM_RE.search(message)
     if job_match:
         job_id = int(job_match.group(1))
     
     # Extract host if present
     host = None
-    host_patterns = [
-        r'\[([a-zA-Z0-9.-]+)\]',  # [hostname]
-        r'host[:\s]+([a-zA-Z0-9.-]+)',  # host: hostname
-        r'on\s+([a-zA-Z0-9.-]+)'  # on hostname
-    ]
-    for pattern in host_patterns:
-        host_match = re.search(pattern, message)
+    for host_re in _HOST_RES:
+        host_match = host_re.search(message)
         if host_match:
             potential_host = host_match.group(1)
             # Simple check if it looks like a hostname
@@ -518,14 +851,16 @@ def _parse_aap_system_logs(line: str, line_number: int) -> Optional[Dict[str, An
     
     # Determine event type
     event_type = "runner_on_ok"
-    failed = level.upper() in ["ERROR", "FATAL", "CRITICAL"]
-    changed = "changed" in message.lower() or "updated" in message.lower()
+    level = level.upper()
+    msg_lower = message.lower()
+    failed = level in {"ERROR", "FATAL", "CRITICAL"}
+    changed = "changed" in msg_lower or "updated" in msg_lower
     
-    if "start" in message.lower():
+    if "start" in msg_lower:
         event_type = "runner_on_start"
-    elif "complete" in message.lower() or "finish" in message.lower():
+    elif "complete" in msg_lower or "finish" in msg_lower:
         event_type = "runner_on_ok"
-    elif "fail" in message.lower() or "error" in message.lower():
+    elif "fail" in msg_lower or "error" in msg_lower:
         event_type = "runner_on_failed"
     
     return {
@@ -536,42 +871,46 @@ def _parse_aap_system_logs(line: str, line_number: int) -> Optional[Dict[str, An
         "host": host,
         "task": None,
         "stdout": "",
-        "level": level.upper(),
+        "level": level,
         "failed": failed,
         "changed": changed,
         "line_number": line_number,
         "message": message
     }
 
-def _parse_awx_logs(line: str, line_number: int) -> Optional[Dict[str, Any]]:
+def _parse_awx_logs(line: str, line_number: int, now_iso: str) -> Optional[Dict[str, Any]]:
     """Parse AWX/Tower specific log formats"""
     
     # AWX supervisor logs: Jan 15 10:30:00 tower-01 awx-manage[1234]: ...
-    syslog_pattern = r'(\w+\s+\d+\s+\d{2}:\d{2}:\d{2})\s+([^\s]+)\s+([^:]+):\s*(.*)'
-    match = re.match(syslog_pattern, line)
+    match = _AWX_SYSLOG_RE.match(line)
     
     if match:
         timestamp_str, hostname, process, message = match.groups()
         
-        # Convert syslog timestamp (add current year)
+        # Convert syslog timestamp (add current year) without strptime
         try:
-            current_year = datetime.now().year
-            dt = datetime.strptime(f"{current_year} {timestamp_str}", '%Y %b %d %H:%M:%S')
-            dt = dt.replace(tzinfo=timezone.utc)
+            month_str, day_str, time_str = timestamp_str.split()
+            month = _SYSLOG_MONTHS.get(month_str.lower())
+            if month is None or len(day_str) > 2:
+                raise ValueError(f"invalid syslog timestamp: {timestamp_str}")
+            hour, minute, second = time_str.split(':')
+            dt = datetime(int(now_iso[:4]), month, int(day_str),
+                          int(hour), int(minute), int(second), tzinfo=timezone.utc)
             timestamp = dt.isoformat()
         except ValueError:
-            timestamp = datetime.now(timezone.utc).isoformat()
+            timestamp = now_iso
         
         # Extract job information
         job_id = 1
-        job_match = re.search(r'[Jj]ob\s*[:#]?\s*(\d+)', message)
+        job_match = _AWX_JOB_RE.search(message)
         if job_match:
             job_id = int(job_match.group(1))
         
         level = "INFO"
-        if any(word in message.upper() for word in ["ERROR", "FAIL", "FATAL"]):
+        keywords = set(_LEVEL_KEYWORDS_RE.findall(message.upper()))
+        if not keywords.isdisjoint(_ERROR_KEYWORDS):
             level = "ERROR"
-        elif any(word in message.upper() for word in ["WARN", "WARNING"]):
+        elif "WARN" in keywords:  # also covers WARNING
             level = "WARN"
         
         return {
@@ -591,21 +930,22 @@ def _parse_awx_logs(line: str, line_number: int) -> Optional[Dict[str, Any]]:
     
     return None
 
-def _create_generic_entry(line: str, line_number: int) -> Dict[str, Any]:
+def _create_generic_entry(line: str, line_number: int, now_iso: str) -> Dict[str, Any]:
     """Create a generic log entry when no specific parser matches"""
     
     # Try to extract some basic information
     level = "INFO"
-    if any(word in line.upper() for word in ["ERROR", "FAIL", "FATAL"]):
+    keywords = set(_LEVEL_KEYWORDS_RE.findall(line.upper()))
+    if not keywords.isdisjoint(_ERROR_KEYWORDS):
         level = "ERROR"
-    elif any(word in line.upper() for word in ["WARN", "WARNING"]):
+    elif "WARN" in keywords:  # also covers WARNING
         level = "WARN"
-    elif any(word in line.upper() for word in ["DEBUG"]):
+    elif "DEBUG" in keywords:
         level = "DEBUG"
     
     return {
         "job_id": 1,  # Default job ID
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": now_iso,
         "event_type": "runner_on_ok",
         "event_display": line,
         "host": None,
@@ -618,126 +958,178 @@ def _create_generic_entry(line: str, line_number: int) -> Dict[str, Any]:
         "message": line
     }
 
+# Variant nibble (RFC 4122: 0b10xx) for each random hex digit
+_UUID_VARIANT_HEX = {c: '89ab'[int(c, 16) & 3] for c in '0123456789abcdef'}
+
+def _uuid4_strings(batch_size: int = 1024) -> Iterator[str]:
+    """Yield random version 4 UUID strings, drawing entropy in batches"""
+    while True:
+        pool = os.urandom(16 * batch_size).hex()
+        for offset in range(0, len(pool), 32):
+            h = pool[offset:offset + 32]
+            yield f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{_UUID_VARIANT_HEX[h[16]]}{h[17:20]}-{h[20:]}"
+
+# Parser for each _DISPATCH_RE group
+_FORMAT_PARSERS = {
+    "structured": _parse_structured_format,
+    "json": _parse_json_format,
+    "ansible": _parse_ansible_output,
+    "system": _parse_aap_system_logs,
+    "awx": _parse_awx_logs
+}
+
 def create_aap_job_from_log(log_content: str, job_name: str) -> int:
     """Parse log content and create AAP job with events"""
+    job_id, events = _parse_log_events(log_content.split('\n'))
+    return _store_aap_job(job_id, events, job_name)
+
+def _parse_log_events(log_lines: Iterable[str]) -> Tuple[Optional[int], JobEventColumns]:
+    """Parse log lines into (job_id, events) without touching the job stores.
+    
+    Event ids are numbered from 0 here; _store_aap_job assigns the global ids.
+    Safe to run in a worker process.
+    """
+    parser = _IncrementalLogParser()
+    parser.feed_lines(log_lines)
+    return parser.job_id, parser.events
+
+class _IncrementalLogParser:
+    """_parse_log_events state kept across calls, so a log can be parsed as it arrives.
+    
+    feed() takes raw UTF-8 bytes in arbitrary chunks (e.g. straight from an
+    upload) and parses every complete line; close() parses the final unterminated
+    line and returns (job_id, events).
+    """
+    
+    def __init__(self):
+        self.events = JobEventColumns()
+        self.job_id: Optional[int] = None
+        self._next_uuid = _uuid4_strings().__next__
+        self._line_num = 0
+        # Lines without their own timestamp all get the ingest time
+        self._now_iso = datetime.now(timezone.utc).isoformat()
+        # Undecoded bytes of a split UTF-8 sequence and text of a split line
+        # carry over to the next chunk (split on LF only, like newline='\n')
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        self._partial_line = ""
+    
+    def feed(self, chunk: bytes):
+        """Parse the complete lines in chunk, holding back any trailing partial line"""
+        lines = (self._partial_line + self._decoder.decode(chunk)).split('\n')
+        self._partial_line = lines.pop()
+        self.feed_lines(lines)
+    
+    def close(self) -> Tuple[Optional[int], JobEventColumns]:
+        """Parse whatever is left after the last newline and return (job_id, events)"""
+        last_line = self._partial_line + self._decoder.decode(b'', final=True)
+        self._partial_line = ""
+        if last_line:
+            self.feed_lines((last_line,))
+        return self.job_id, self.events
+    
+    def feed_lines(self, log_lines: Iterable[str]):
+        """Parse already-split lines, continuing the line numbering"""
+        append_event = self.events.append
+        next_uuid = self._next_uuid
+        now_iso = self._now_iso
+        event_index = len(self.events)
+        job_id = self.job_id
+        line_num = self._line_num
+        
+        # Hot loop: parse_aap_log_line already skips blank lines
+        try:
+            for line_num, line in enumerate(log_lines, line_num + 1):
+                event_data = parse_aap_log_line(line, line_num, now_iso)
+                if not event_data:
+                    continue
+                
+                if job_id is None:
+                    job_id = event_data["job_id"]
+                
+                # Create AAP job event
+                append_event(event_index, next_uuid(), event_data)
+                event_index += 1
+        finally:
+            self.job_id = job_id
+            self._line_num = line_num
+
+def _store_aap_job(job_id: Optional[int], events: JobEventColumns, job_name: str) -> int:
+    """Assign event ids to parsed events and store them as an AAP job"""
     global aap_next_job_id, aap_next_event_id
     
-    lines = log_content.split('\n')
-    events = []
-    job_id = None
-    hosts = set()
-    tasks = set()
-    start_time = None
-    end_time = None
-    
-    for line_num, line in enumerate(lines, 1):
-        if not line.strip():
-            continue
+    # Uploads store from the event loop and refreshes from a threadpool worker;
+    # id allocation and registration must not interleave (the event id ranges
+    # in aap_event_id_starts have to stay in ascending order for bisection)
+    with aap_store_lock:
+        events.id = list(range(aap_next_event_id, aap_next_event_id + len(events)))
+        aap_next_event_id += len(events)
         
-        event_data = parse_aap_log_line(line, line_num)
-        if not event_data:
-            continue
+        start_time = events.created[0] if len(events) else None
+        end_time = events.created[-1] if len(events) else None
         
-        if job_id is None:
-            job_id = event_data["job_id"]
-        
-        if event_data["host"]:
-            hosts.add(event_data["host"])
-        
-        if event_data["task"]:
-            tasks.add(event_data["task"])
+        # Calculate elapsed time
+        if start_time and end_time:
+            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+            elapsed = (end_dt - start_dt).total_seconds()
+        else:
+            elapsed = 0.0
         
-        if start_time is None:
-            start_time = event_data["timestamp"]
-        end_time = event_data["timestamp"]
+        # Determine job status
+        has_failures = any(events.failed)
+        status = "failed" if has_failures else "successful"
         
-        # Create AAP job event
-        event = {
-            "id": aap_next_event_id,
-            "event": event_data["event_type"],
-            "counter": len(events) + 1,
-            "event_display": event_data["event_display"],
-            "event_data": {
-                "res": {"stdout": event_data["stdout"]} if event_data["stdout"] else {},
-                "task": event_data["task"],
-                "task_args": "",
-                "task_action": event_data["task"] if event_data["task"] else "",
-                "host": event_data["host"]
-            },
-            "event_level": 3,
-            "failed": event_data["failed"],
-            "changed": event_data["changed"],
-            "uuid": str(uuid.uuid4()),
-            "parent_uuid": None,
-            "host": event_data["host"],
-            "host_name": event_data["host"],
+        # Create AAP job
+        job = {
+            "id": job_id or aap_next_job_id,
+            "name": job_name,
+            "status": status,
+            "started": start_time,
+            "finished": end_time,
+            "elapsed": elapsed,
+            "job_template": 1,
+            "inventory": 1,
+            "project": 1,
             "playbook": "main.yml",
-            "play": "Deploy Application",
-            "task": event_data["task"],
-            "role": None,
-            "stdout": event_data["stdout"],
-            "start_line": event_data["line_number"],
-            "end_line": event_data["line_number"],
-            "verbosity": 0,
-            "created": event_data["timestamp"],
-            "modified": event_data["timestamp"],
-            "url": f"/api/v2/job_events/{aap_next_event_id}/"
+            "execution_node": "controller-1",
+            "created": start_time or datetime.now(timezone.utc).isoformat(),
+            "modified": end_time or datetime.now(timezone.utc).isoformat(),
+            "job_type": "run",
+            "launch_type": "manual",
+            "url": f"/api/v2/jobs/{job_id or aap_next_job_id}/"
         }
-        events.append(event)
-        aap_next_event_id += 1
-    
-    # Calculate elapsed time
-    if start_time and end_time:
-        start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-        end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-        elapsed = (end_dt - start_dt).total_seconds()
-    else:
-        elapsed = 0.0
-    
-    # Determine job status
-    has_failures = any(e["failed"] for e in events)
-    status = "failed" if has_failures else "successful"
-    
-    # Create AAP job
-    job = {
-        "id": job_id or aap_next_job_id,
-        "name": job_name,
-        "status": status,
-        "started": start_time,
-        "finished": end_time,
-        "elapsed": elapsed,
-        "job_template": 1,
-        "inventory": 1,
-        "project": 1,
-        "playbook": "main.yml",
-        "execution_node": "controller-1",
-        "created": start_time or datetime.now(timezone.utc).isoformat(),
-        "modified": end_time or datetime.now(timezone.utc).isoformat(),
-        "job_type": "run",
-        "launch_type": "manual",
-        "url": f"/api/v2/jobs/{job_id or aap_next_job_id}/"
-    }
-    
-    final_job_id = job_id or aap_next_job_id
-    aap_jobs_db[final_job_id] = job
-    aap_job_events_db[final_job_id] = events
-    
-    if job_id is None:
-        aap_next_job_id += 1
-    
-    return final_job_id
+        
+        final_job_id = job_id or aap_next_job_id
+        aap_jobs_db[final_job_id] = job
+        aap_job_events_db[final_job_id] = events
+        
+        # A job stored again under the same id keeps its place in the listing
+        position = aap_job_positions.get(final_job_id)
+        if position is None:
+            aap_job_positions[final_job_id] = len(aap_jobs_list)
+            aap_jobs_list.append(job)
+        else:
+            aap_jobs_list[position] = job
+        
+        if len(events):
+            aap_event_id_starts.append(events.id[0])
+            aap_event_id_jobs.append(final_job_id)
+        
+        if job_id is None:
+            aap_next_job_id += 1
+        
+        return final_job_id
 
 # AAP-compatible API endpoints
 @app.get("/api/v2/jobs/")
 def list_jobs(page: int = Query(1, ge=1), page_size: int = Query(25, ge=1, le=200)):
     """List all jobs (AAP-compatible endpoint)"""
-    jobs = list(aap_jobs_db.values())
-    total_count = len(jobs)
+    total_count = len(aap_jobs_list)
     
-    # Simple pagination
+    # Simple pagination (slicing copies only the requested page)
     start_idx = (page - 1) * page_size
     end_idx = start_idx + page_size
-    page_jobs = jobs[start_idx:end_idx]
+    page_jobs = aap_jobs_list[start_idx:end_idx]
     
     return {
         "count": total_count,
@@ -766,7 +1158,7 @@ def get_job_events(job_id: int, page: int = Query(1, ge=1), page_size: int = Que
     # Simple pagination
     start_idx = (page - 1) * page_size
     end_idx = start_idx + page_size
-    page_events = events[start_idx:end_idx]
+    page_events = events.rows(start_idx, end_idx)
     
     return {
         "count": total_count,
@@ -783,51 +1175,41 @@ def get_job_stdout(job_id: int, format: str = Query("json"), download: bool = Qu
     
     events = aap_job_events_db[job_id]
     
+    content = events.stdout_text()
+    
     if format == "txt" or format == "ansi":
         # Return plain text stdout
-        stdout_lines = []
-        for event in events:
-            if event.get("stdout"):
-                stdout_lines.append(event["stdout"])
-            else:
-                stdout_lines.append(event["event_display"])
-        
-        content = "\n".join(stdout_lines)
         return PlainTextResponse(content, media_type="text/plain")
     
     # Return JSON format with range info
-    stdout_data = {
+    return {
         "range": {"start": 0, "end": len(events), "absolute_end": len(events)},
-        "content": ""
+        "content": content
     }
-    
-    stdout_lines = []
-    for event in events:
-        if event.get("stdout"):
-            stdout_lines.append(event["stdout"])
-        else:
-            stdout_lines.append(event["event_display"])
-    
-    stdout_data["content"] = "\n".join(stdout_lines)
-    
-    return stdout_data
 
 @app.get("/api/v2/job_events/{event_id}/")
 def get_job_event_detail(event_id: int):
     """Get specific job event details (AAP-compatible endpoint)"""
-    # Search through all job events
-    for job_id, events in aap_job_events_db.items():
-        for event in events:
-            if event["id"] == event_id:
-                return event
+    # Find the id range the event falls in; it only counts if that range still
+    # belongs to the job's current events (a job stored again gets new ids)
+    range_index = bisect.bisect_right(aap_event_id_starts, event_id) - 1
+    if range_index >= 0:
+        first_id = aap_event_id_starts[range_index]
+        events = aap_job_events_db.get(aap_event_id_jobs[range_index])
+        if events is not None and len(events) and events.id[0] == first_id:
+            index = event_id - first_id
+            if index < len(events):
+                return events.row(index)
     
     raise HTTPException(status_code=404, detail="Job event not found")
 
 # Additional AAP resource endpoints for compatibility
-@app.get("/api/v2/job_templates/")
-def list_job_templates():
-    """List job templates (AAP-compatible endpoint)"""
-    templates = [
+# (static content: each response body is serialized once at import)
+_JOB_TEMPLATES_RESPONSE = orjson.dumps({
+    "count": 1,
+    "next": None,
+    "previous": None,
+    "results": [
         {
             "id": 1,
             "name": "Deploy Application",
@@ -841,17 +1223,18 @@ def list_job_templates():
             "url": "/api/v2/job_templates/1/"
         }
     ]
-    return {
-        "count": len(templates),
-        "next": None,
-        "previous": None,
-        "results": templates
-    }
+})
 
-@app.get("/api/v2/inventories/")
-def list_inventories():
-    """List inventories (AAP-compatible endpoint)"""
-    inventories = [
+@app.get("/api/v2/job_templates/")
+def list_job_templates():
+    """List job templates (AAP-compatible endpoint)"""
+    return Response(content=_JOB_TEMPLATES_RESPONSE, media_type="application/json")
+
+_INVENTORIES_RESPONSE = orjson.dumps({
+    "count": 1,
+    "next": None,
+    "previous": None,
+    "results": [
         {
             "id": 1,
             "name": "Production Hosts",
@@ -865,17 +1248,18 @@ def list_inventories():
             "url": "/api/v2/inventories/1/"
         }
     ]
-    return {
-        "count": len(inventories),
-        "next": None,
-        "previous": None,
-        "results": inventories
-    }
+})
 
-@app.get("/api/v2/projects/")
-def list_projects():
-    """List projects (AAP-compatible endpoint)"""
-    projects = [
+@app.get("/api/v2/inventories/")
+def list_inventories():
+    """List inventories (AAP-compatible endpoint)"""
+    return Response(content=_INVENTORIES_RESPONSE, media_type="application/json")
+
+_PROJECTS_RESPONSE = orjson.dumps({
+    "count": 1,
+    "next": None,
+    "previous": None,
+    "results": [
         {
             "id": 1,
             "name": "Application Deployment",
@@ -890,46 +1274,51 @@ def list_projects():
             "url": "/api/v2/projects/1/"
         }
     ]
-    return {
-        "count": len(projects),
-        "next": None,
-        "previous": None,
-        "results": projects
-    }
+})
+
+@app.get("/api/v2/projects/")
+def list_projects():
+    """List projects (AAP-compatible endpoint)"""
+    return Response(content=_PROJECTS_RESPONSE, media_type="application/json")
+
+_API_ROOT_RESPONSE = orjson.dumps({
+    "description": "AAP Mock API v2",
+    "current_version": "/api/v2/",
+    "available_versions": {
+        "v2": "/api/v2/"
+    },
+    "oauth2": "/api/o/",
+    "jobs": "/api/v2/jobs/",
+    "job_templates": "/api/v2/job_templates/",
+    "inventories": "/api/v2/inventories/",
+    "projects": "/api/v2/projects/",
+    "job_events": "/api/v2/job_events/"
+})
 
 @app.get("/api/v2/")
 def api_root():
     """AAP API root endpoint"""
-    return {
-        "description": "AAP Mock API v2",
-        "current_version": "/api/v2/",
-        "available_versions": {
-            "v2": "/api/v2/"
-        },
-        "oauth2": "/api/o/",
-        "jobs": "/api/v2/jobs/",
-        "job_templates": "/api/v2/job_templates/",
-        "inventories": "/api/v2/inventories/",
-        "projects": "/api/v2/projects/",
-        "job_events": "/api/v2/job_events/"
-    }
+    return Response(content=_API_ROOT_RESPONSE, media_type="application/json")
 
 # Health checks
+_HEALTHY_RESPONSE = orjson.dumps({"status": "healthy"})
+_READY_RESPONSE = orjson.dumps({"status": "ready"})
+
 @app.get("/healthz")
 def health_check():
-    return {"status": "healthy"}
+    return Response(content=_HEALTHY_RESPONSE, media_type="application/json")
 
 @app.get("/readyz")
 def readiness_check():
-    return {"status": "ready"}
+    return Response(content=_READY_RESPONSE, media_type="application/json")
 
-@app.get("/api/status")
-def get_status() -> StatusResponse:
+@app.get("/api/status", response_model=StatusResponse)
+def get_status() -> Response:
     """Get current replay status"""
-    return StatusResponse(
+    return _model_response(StatusResponse(
         active=replay_state["active"],
         current_job=replay_state["current_job"]
-    )
+    ))
 
 @app.get("/api/auto-loaded")
 def list_auto_loaded_files():
@@ -955,10 +1344,7 @@ def refresh_auto_loaded_files():
     previous_files = set(auto_loaded_files.keys())
     previous_count = len(auto_loaded_files)
     
-    # Clear current auto-loaded files
-    auto_loaded_files.clear()
-    
-    # Re-run the auto-load process
+    # Re-run the auto-load process (only new or changed files are parsed)
     auto_load_sample_logs()
     
     # Calculate changes
@@ -991,8 +1377,8 @@ def refresh_auto_loaded_files():
         ]
     }
 
-@app.post("/api/logs/upload")
-async def upload_log(file: UploadFile = File(...)) -> UploadResponse:
+@app.post("/api/logs/upload", response_model=UploadResponse)
+async def upload_log(file: UploadFile = File(...)) -> Response:
     """Upload a log file for later replay and create AAP job"""
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
@@ -1001,22 +1387,34 @@ async def upload_log(file: UploadFile = File(...)) -> UploadResponse:
     file_id = str(uuid.uuid4())
     file_path = UPLOADS_DIR / f"{file_id}.log"
     
-    content = await file.read()
-    content_str = content.decode('utf-8', errors='ignore')
-    
+    # Stream the upload to disk in 1 MiB chunks, counting lines and parsing
+    # them into an AAP job on the way, so memory stays bounded regardless of
+    # file size and the saved file never has to be read back
+    # (parsing is CPU-bound, so each chunk is parsed on an executor thread to
+    # keep the event loop serving other requests and replays meanwhile)
+    loop = asyncio.get_running_loop()
+    lines_estimate = 0
+    parser: Optional[_IncrementalLogParser] = _IncrementalLogParser()
     with open(file_path, "wb") as f:
-        f.write(content)
-    
-    # Estimate line count
-    lines_estimate = content_str.count('\n')
+        while chunk := await file.read(1 << 20):
+            f.write(chunk)
+            lines_estimate += chunk.count(b'\n')
+            if parser:
+                try:
+                    await loop.run_in_executor(None, parser.feed, chunk)
+                except Exception as e:
+                    # Keep saving the file; it just won't become an AAP job
+                    logger.warning(f"Failed to parse uploaded file as AAP job: {e}")
+                    parser = None
     
-    # Parse into AAP job format
-    try:
-        job_id = create_aap_job_from_log(content_str, file.filename or f"Uploaded Job {file_id}")
-        logger.info(f"Uploaded file {file.filename} as {file_id}, created AAP job {job_id}, estimated {lines_estimate} lines")
-    except Exception as e:
-        logger.warning(f"Failed to parse uploaded file as AAP job: {e}")
-        job_id = None
+    job_id = None
+    if parser:
+        try:
+            parsed_job_id, events = parser.close()
+            job_id = _store_aap_job(parsed_job_id, events, file.filename or f"Uploaded Job {file_id}")
+            logger.info(f"Uploaded file {file.filename} as {file_id}, created AAP job {job_id}, estimated {lines_estimate} lines")
+        except Exception as e:
+            logger.warning(f"Failed to parse uploaded file as AAP job: {e}")
     
     response = UploadResponse(
         id=file_id,
@@ -1029,7 +1427,7 @@ async def upload_log(file: UploadFile = File(...)) -> UploadResponse:
         response.aap_job_id = job_id
         response.aap_job_url = f"/api/v2/jobs/{job_id}/"
     
-    return response
+    return _model_response(response)
 
 @app.post("/api/logs/generate")
 def generate_logs(request: GenerateLogsRequest):
@@ -1041,10 +1439,19 @@ def generate_logs(request: GenerateLogsRequest):
     # Generate synthetic logs
     logs = _generate_synthetic_logs(request)
     
-    # Write to file
-    with open(output_path, "w") as f:
-        for log_entry in logs:
-            f.write(json.dumps(log_entry) + "\n")
+    # Write to file (orjson emits compact UTF-8 bytes, one line per entry)
+    with open(output_path, "wb", buffering=1 << 20) as f:
+        f.writelines(orjson.dumps(log_entry, option=orjson.OPT_APPEND_NEWLINE) for log_entry in logs)
+    
+    # Point latest_<job_id>.jsonl at the new file so replays find it without
+    # scanning the directory (swapped in atomically via a temporary link)
+    latest_path = GENERATED_DIR / f"latest_{job_id}.jsonl"
+    temp_link = GENERATED_DIR / f".latest_{job_id}.{uuid.uuid4().hex}"
+    try:
+        temp_link.symlink_to(output_path.name)
+        os.replace(temp_link, latest_path)
+    except OSError as e:
+        logger.warning(f"Could not update {latest_path.name}: {e}")
     
     logger.info(f"Generated {len(logs)} log entries for job {job_id}")
     
@@ -1055,37 +1462,57 @@ def generate_logs(request: GenerateLogsRequest):
         "estimated_duration": request.duration_minutes
     }
 
+def _list_uploads() -> List[Path]:
+    """Uploaded log files, newest first (cached until the directory changes)"""
+    dir_mtime_ns = UPLOADS_DIR.stat().st_mtime_ns
+    if dir_mtime_ns != _uploads_cache["dir_mtime_ns"]:
+        with os.scandir(UPLOADS_DIR) as it:
+            entries = [(entry.stat().st_mtime, entry.path) for entry in it
+                       if entry.name.endswith(".log") and entry.is_file()]
+        entries.sort(reverse=True)
+        _uploads_cache["files"] = [Path(path) for _, path in entries]
+        _uploads_cache["dir_mtime_ns"] = dir_mtime_ns
+    return _uploads_cache["files"]
+
+def _spawn_replay(replay: Coroutine[Any, Any, Any], stop_event: threading.Event):
+    """Run a replay as an event loop task, independent of the request that started it"""
+    # Only a replay that actually starts is tracked: requests rejected before
+    # this point must not leave an unset event behind for the next start
+    active_stop_events.add(stop_event)
+    task = asyncio.get_running_loop().create_task(replay)
+    replay_tasks.add(task)  # The loop only keeps weak references to tasks
+    task.add_done_callback(replay_tasks.discard)
+
 @app.post("/api/logs/replay")
-def start_replay(request: ReplayRequest, background_tasks: BackgroundTasks):
+async def start_replay(request: ReplayRequest):
     """Start replaying logs"""
     # CRITICAL FIX: Force stop any existing replay before starting new one
-    if replay_state["active"] and replay_state["stop_event"]:
+    running = [event for event in list(active_stop_events) if not event.is_set()]
+    if running:
         logger.warning("🛑 Forcing stop of existing replay before starting new one")
-        replay_state["stop_event"].set()
+        for event in running:
+            event.set()
         # Wait a moment for the old task to clean up
-        time.sleep(0.5)
+        await asyncio.sleep(0.5)
     
     # Set up replay state early (needed for "all" functionality)  
     stop_event = threading.Event()
     replay_state["active"] = True
     replay_state["stop_event"] = stop_event
     
-    # CRITICAL FIX: Clear global stop flag for new replay
-    global_stop_flag.clear()
-    
     # Find source file
     if request.source == "uploaded":
         if request.id_or_path == "latest":
             # Find the most recently uploaded file
-            uploaded_files = list(UPLOADS_DIR.glob("*.log"))
+            uploaded_files = _list_uploads()
             if not uploaded_files:
                 replay_state["active"] = False  # Reset state on error
                 raise HTTPException(status_code=404, detail="No uploaded files found")
-            source_path = max(uploaded_files, key=lambda p: p.stat().st_mtime)
+            source_path = uploaded_files[0]
             logger.info(f"Using latest uploaded file: {source_path.name}")
         elif request.id_or_path == "all":
             # Special case: replay all uploaded files sequentially
-            uploaded_files = list(UPLOADS_DIR.glob("*.log"))
+            uploaded_files = _list_uploads()
             if not uploaded_files:
                 replay_state["active"] = False  # Reset state on error
                 raise HTTPException(status_code=404, detail="No uploaded files found")
@@ -1103,7 +1530,7 @@ def start_replay(request: ReplayRequest, background_tasks: BackgroundTasks):
             }
             
             # Start background task to replay all files
-            background_tasks.add_task(_replay_all_uploaded, request, stop_event)
+            _spawn_replay(_replay_all_uploaded(request, stop_event), stop_event)
             
             return {
                 "status": "started", 
@@ -1117,12 +1544,17 @@ def start_replay(request: ReplayRequest, background_tasks: BackgroundTasks):
         if request.id_or_path.endswith('.jsonl'):
             source_path = GENERATED_DIR / request.id_or_path
         else:
-            # Find generated file by job_id pattern
-            candidates = list(GENERATED_DIR.glob(f"{request.id_or_path}_*.jsonl"))
-            if not candidates:
-                replay_state["active"] = False  # Reset state on error
-                raise HTTPException(status_code=404, detail="Generated log file not found")
-            source_path = max(candidates, key=lambda p: p.stat().st_mtime)  # Most recent
+            # Most recent file for the job: follow its latest_ link, falling
+            # back to a scan by job_id pattern (e.g. files from older versions)
+            latest_path = GENERATED_DIR / f"latest_{request.id_or_path}.jsonl"
+            if latest_path.is_file():
+                source_path = latest_path.resolve()
+            else:
+                candidates = list(GENERATED_DIR.glob(f"{request.id_or_path}_*.jsonl"))
+                if not candidates:
+                    replay_state["active"] = False  # Reset state on error
+                    raise HTTPException(status_code=404, detail="Generated log file not found")
+                source_path = max(candidates, key=lambda p: p.stat().st_mtime)  # Most recent
     elif request.source == "auto-loaded":
         if request.id_or_path == "all":
             # Special case: replay all auto-loaded files sequentially
@@ -1143,7 +1575,7 @@ def start_replay(request: ReplayRequest, background_tasks: BackgroundTasks):
             }
             
             # Start background task to replay all files
-            background_tasks.add_task(_replay_all_auto_loaded, request, stop_event)
+            _spawn_replay(_replay_all_auto_loaded(request, stop_event), stop_event)
             
             return {
                 "status": "started", 
@@ -1180,23 +1612,19 @@ def start_replay(request: ReplayRequest, background_tasks: BackgroundTasks):
     }
     
     # Start replay in background
-    background_tasks.add_task(_replay_logs, source_path, request, stop_event)
+    _spawn_replay(_replay_logs(source_path, request, stop_event), stop_event)
     
     return {"status": "started", "source_path": str(source_path)}
 
 @app.post("/api/replay/stop")
 def stop_replay():
     """Stop active replay"""
-    logger.info(f"🛑 Stop request received. Active: {replay_state['active']}, Stop event exists: {replay_state['stop_event'] is not None}")
+    stop_events = list(active_stop_events)
+    logger.info(f"🛑 Stop request received. Active: {replay_state['active']}, Stop events: {len(stop_events)}")
     
-    # CRITICAL FIX: ALWAYS set global stop flag regardless of state
-    logger.info("🛑 Setting global stop flag (works even with corrupted state)")
-    global_stop_flag.set()
-    
-    # Also set regular stop event if it exists
-    if replay_state["stop_event"]:
-        logger.info("🛑 Setting regular stop event")
-        replay_state["stop_event"].set()
+    # CRITICAL FIX: ALWAYS stop every tracked replay regardless of replay_state
+    for event in stop_events:
+        event.set()
     
     return {"status": "stopping"}
 
@@ -1216,27 +1644,22 @@ def _generate_synthetic_logs(request: GenerateLogsRequest) -> List[Dict[str, Any
     
     events_per_minute = request.events_per_minute
     total_events = request.duration_minutes * events_per_minute
-    time_increment = 60.0 / events_per_minute  # seconds between events
+    time_increment = timedelta(seconds=60.0 / events_per_minute)  # between events
+    event_types = ["task_start", "task_running", "task_result"]
+    
+    # Draw every event's random host, task, event type and failure up front:
+    # choices(k=n) samples in one C-level loop instead of a call per event
+    hosts = _rng.choices(request.hosts, k=total_events)
+    tasks = _rng.choices(request.tasks, k=total_events)
+    types = _rng.choices(event_types, k=total_events)
+    random_float, failure_rate = _rng.random, request.failure_rate
+    failures = [random_float() < failure_rate for _ in range(total_events)]
     
     current_time = start_time
     
-    for i in range(total_events):
-        # Advance time
-        current_time = start_time.replace(
-            second=int(start_time.second + (i * time_increment)) % 60,
-            minute=start_time.minute + int((start_time.second + (i * time_increment)) / 60)
-        )
-        
-        # Pick random host and task
-        host = random.choice(request.hosts)
-        task = random.choice(request.tasks)
-        
-        # Determine if this should be a failure
-        is_failure = random.random() < request.failure_rate
-        
-        # Generate different types of events
-        event_types = ["task_start", "task_running", "task_result"]
-        event_type = random.choice(event_types)
+    for i, host, task, event_type, is_failure in zip(range(total_events), hosts, tasks, types, failures):
+        # Advance time (timedelta carries seconds into minutes, hours and days)
+        current_time = start_time + i * time_increment
         
         log_entry = {
             "timestamp": current_time.isoformat(),
@@ -1274,8 +1697,15 @@ def _generate_synthetic_logs(request: GenerateLogsRequest) -> List[Dict[str, Any
     
     return logs
 
-def _replay_logs(source_path: Path, request: ReplayRequest, stop_event: threading.Event):
-    """Replay logs from file"""
+def _jitter_samples(max_seconds: float, batch_size: int = 1024) -> Iterator[float]:
+    """Yield uniform random delays in [0, max_seconds), drawn in batches"""
+    random_float = _rng.random
+    while True:
+        yield from [random_float() * max_seconds for _ in range(batch_size)]
+
+async def _replay_logs(source_path: Path, request: ReplayRequest, stop_event: threading.Event) -> Optional[bool]:
+    """Replay logs from file (returns False if there was nothing to replay)"""
+    stopped = stop_event.is_set  # Checked per line: bind once
     try:
         logger.info(f"Starting replay from {source_path}")
         
@@ -1283,60 +1713,82 @@ def _replay_logs(source_path: Path, request: ReplayRequest, stop_event: threadin
         file_size = source_path.stat().st_size
         if file_size == 0:
             logger.error(f"❌ Cannot replay empty file: {source_path.name} (0 bytes)")
-            return
+            return False
         
-        # Count actual content lines
-        with open(source_path, 'r') as f:
-            content_lines = [line.strip() for line in f if line.strip()]
+        logger.info(f"📋 File validated: {source_path.name} - {file_size} bytes to replay")
         
-        if len(content_lines) == 0:
-            logger.error(f"❌ Cannot replay file with no content: {source_path.name} (no valid lines)")
-            return
-            
-        logger.info(f"📋 File validated: {source_path.name} - {len(content_lines)} lines to replay")
+        # Pacing: each line has a deadline (previous deadline + rate period +
+        # random jitter) and the loop sleeps once until it. Time spent writing
+        # is absorbed instead of added, and lines due within the next
+        # millisecond are emitted together without a sleep. Replays run as
+        # coroutines on the event loop, so waiting never holds a thread.
+        period = 1.0 / request.rate_lines_per_sec if request.rate_lines_per_sec > 0 else 0.0
+        if request.jitter_ms > 0:
+            jitter = _jitter_samples(request.jitter_ms / 1000.0)
+        else:
+            jitter = itertools.repeat(0.0)
+        
+        write_file = request.mode in ["file", "both"]
+        send_otlp = request.mode in ["otlp", "both"] and bool(request.otlp_endpoint)
         
         loop_count = 0
+        lines_since_yield = 0
         while True:
-            if stop_event.is_set() or global_stop_flag.is_set():
+            if stopped():
                 logger.info("🛑 Replay stopped by user (cycle check)")
                 return
                 
             loop_count += 1
             lines_processed = 0
+            deadline = time.monotonic() - period  # First line is due after its jitter only
             
-            with open(source_path, 'r') as f:
-                for line_num, line in enumerate(f, 1):
-                    if stop_event.is_set() or global_stop_flag.is_set():
+            # The file is reopened every cycle so edits between cycles are
+            # picked up (no mmap: a file truncated while mapped raises SIGBUS,
+            # which kills the process). Line endings are trimmed and blank lines
+            # skipped on the raw bytes, and each line is decoded exactly once
+            with open(source_path, 'rb', buffering=1 << 20) as f:
+                for raw_line in f:
+                    if stopped():
                         logger.info("🛑 Replay stopped by user (line check)")
                         return
                     
-                    line = line.rstrip('\n\r')  # Only remove newlines, preserve spaces!
-                    if not line:
+                    raw_line = raw_line.rstrip(b'\n\r')  # Only remove line endings, preserve spaces!
+                    if not raw_line:
                         continue
+                    line = raw_line.decode('utf-8', errors='replace')
                     
                     lines_processed += 1
                     
-                    # Add jitter
-                    if request.jitter_ms > 0:
-                        jitter = random.uniform(0, request.jitter_ms / 1000.0)
-                        time.sleep(jitter)
+                    # Wait for this line's deadline (rate limiting + jitter)
+                    deadline += period + next(jitter)
+                    delay = deadline - time.monotonic()
+                    if delay > 0.001:
+                        await asyncio.sleep(delay)
+                        lines_since_yield = 0
+                    else:
+                        lines_since_yield += 1
+                        if lines_since_yield >= 64:
+                            # Unpaced or behind: still let the event loop serve requests
+                            await asyncio.sleep(0)
+                            lines_since_yield = 0
                     
                     # Output to file
-                    if request.mode in ["file", "both"]:
+                    if write_file:
                         _write_to_output_file(line)
                     
                     # Output to OTLP
-                    if request.mode in ["otlp", "both"] and request.otlp_endpoint:
+                    if send_otlp:
                         _send_to_otlp(line, request.otlp_endpoint)
-                    
-                    # Rate limiting
-                    if request.rate_lines_per_sec > 0:
-                        time.sleep(1.0 / request.rate_lines_per_sec)
+            
+            # No content lines is only known after the first pass (no pre-scan)
+            if lines_processed == 0:
+                logger.error(f"❌ Cannot replay file with no content: {source_path.name} (no valid lines)")
+                return False
             
             logger.info(f"Completed replay cycle {loop_count}: processed {lines_processed} lines from {source_path.name}")
             
             # Check for stop before deciding to loop
-            if stop_event.is_set() or global_stop_flag.is_set():
+            if stopped():
                 logger.info("🛑 Replay stopped by user (before loop decision)")
                 return
             
@@ -1356,48 +1808,72 @@ def _replay_logs(source_path: Path, request: ReplayRequest, stop_event: threadin
 
 def _write_to_output_file(line: str):
     """Write log line to stdout for Kubernetes log collection (Alloy/Promtail)"""
-    # Convert any format to structured AAP format for log aggregation
-    structured_line = _normalize_to_structured_aap_format(line)
-    
-    # PRIMARY: Write to stdout for Kubernetes/Alloy collection
-    aap_logger.info(structured_line)
-    
-    # OPTIONAL: Also write to file for backward compatibility / local debugging
-    # You can disable this in production if you only want stdout
-    with open(OUTPUT_LOG_FILE, "a") as f:
-        f.write(f"{structured_line}\n")
+    # PRIMARY: Write to stdout for Kubernetes/Alloy collection (aap_logger
+    # also appends to OUTPUT_LOG_FILE when AAP_MOCK_WRITE_FILE=1). The listener
+    # thread converts the line to structured AAP format on its way out.
+    aap_logger.info(line)
+
+# Lines already in structured form pass through unchanged. The pattern is
+# anchored by match(), so a line can only qualify if it starts with a digit
+# (ISO timestamp) or with E/W/D (ERROR, WARN, DEBUG) - checked before the regex.
+_NORMALIZED_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}.*?INFO|ERROR|WARN|DEBUG.*?\[.*?\]')
+# Level keywords, matched case-insensitively without lowercasing a copy of the
+# line (ASCII folding only, which is exactly what str.lower() gives for these)
+_ERROR_LEVEL_RE = re.compile(r'error|failed|fatal', re.IGNORECASE | re.ASCII)
+_WARN_LEVEL_RE = re.compile(r'warn', re.IGNORECASE | re.ASCII)  # also covers "warning"
 
-def _normalize_to_structured_aap_format(line: str) -> str:
-    """Convert any log format to structured AAP format for external log aggregation"""
+# Last whole second formatted by _utc_timestamp: (epoch seconds, "YYYY-MM-DDTHH:MM:SS")
+_timestamp_second = (-1, "")
+
+def _utc_timestamp(epoch: Optional[float] = None) -> str:
+    """UTC time as YYYY-MM-DDTHH:MM:SS.ffffffZ without building a datetime
+    
+    epoch is a time.time() value (e.g. LogRecord.created); defaults to now.
+    """
+    global _timestamp_second
+    if epoch is None:
+        seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+        micros = nanos // 1000
+    else:
+        seconds = int(epoch)
+        micros = min(int((epoch - seconds) * 1_000_000), 999_999)
+    cached_seconds, prefix = _timestamp_second
+    if seconds != cached_seconds:
+        # Formatted at most once per second; lines within it only add microseconds
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        _timestamp_second = (seconds, prefix)
+    return f"{prefix}.{micros:06d}Z"
+
+def _normalize_to_structured_aap_format(line: str, created: Optional[float] = None) -> str:
+    """Convert any log format to structured AAP format for external log aggregation
+    
+    created is when the line was produced (defaults to now); it becomes the
+    line's timestamp.
+    """
     # If already in structured format, return as-is
-    if re.match(r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}.*?INFO|ERROR|WARN|DEBUG.*?\[.*?\]', line):
+    first = line[:1]
+    if first and (first in 'EWD' or first.isdigit()) and _NORMALIZED_RE.match(line):
         return line
     
-    # Get current timestamp in AAP format
-    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    # Get the line's timestamp in AAP format
+    timestamp = _utc_timestamp(created)
     
-    # Determine log level and job context
+    # Determine log level
     level = "INFO"
-    job_context = "[aap_mock]"
-    
-    if any(keyword in line.lower() for keyword in ["error", "failed", "fatal"]):
+    if line.startswith("[WARNING]"):
+        level = "WARN"
+    elif _ERROR_LEVEL_RE.search(line):
         level = "ERROR"
-    elif any(keyword in line.lower() for keyword in ["warn", "warning"]):
+    elif _WARN_LEVEL_RE.search(line):
         level = "WARN"
     
-    # For raw Ansible output, preserve the content but structure it
-    if line.startswith(("PLAY [", "TASK [", "HANDLER [")):
-        return f"{timestamp} {level} {job_context} {line}"
-    elif line.startswith(("ok:", "changed:", "failed:", "skipping:")):
-        return f"{timestamp} {level} {job_context} {line}"
-    elif line.startswith("[WARNING]"):
-        return f"{timestamp} WARN {job_context} {line}"
-    else:
-        # Generic structured format
-        return f"{timestamp} {level} {job_context} {line}"
+    # Raw Ansible output and everything else share one structured layout, with
+    # the content preserved; a single f-string builds the line in one allocation
+    return f"{timestamp} {level} [aap_mock] {line}"
 
-def _replay_all_auto_loaded(request: ReplayRequest, stop_event: threading.Event):
+async def _replay_all_auto_loaded(request: ReplayRequest, stop_event: threading.Event):
     """Replay all auto-loaded files sequentially"""
+    stopped = stop_event.is_set
     try:
         files_to_replay = list(auto_loaded_files.items())
         total_files = len(files_to_replay)
@@ -1407,7 +1883,7 @@ def _replay_all_auto_loaded(request: ReplayRequest, stop_event: threading.Event)
         
         # Handle looping at the "all files" level, not individual file level
         while True:
-            if stop_event.is_set() or global_stop_flag.is_set():
+            if stopped():
                 logger.info("🛑 Replay all stopped by user (outer loop)")
                 return
                 
@@ -1418,7 +1894,7 @@ def _replay_all_auto_loaded(request: ReplayRequest, stop_event: threading.Event)
             logger.info(f"🔄 Starting cycle {cycle_count} of all files")
             
             for file_index, (file_key, file_path) in enumerate(files_to_replay, 1):
-                if stop_event.is_set() or global_stop_flag.is_set():
+                if stopped():
                     logger.info("🛑 Replay all stopped by user (file loop)")
                     return
                     
@@ -1440,15 +1916,6 @@ def _replay_all_auto_loaded(request: ReplayRequest, stop_event: threading.Event)
                         skipped_count += 1
                         continue
                     
-                    # Quick content check
-                    with open(source_path, 'r') as f:
-                        content_lines = [line.strip() for line in f if line.strip()]
-                    
-                    if len(content_lines) == 0:
-                        logger.warning(f"⚠️  Skipping file with no content: {file_key} (no valid lines)")
-                        skipped_count += 1
-                        continue
-                    
                     # Create a modified request with loop=False for individual files
                     individual_request = ReplayRequest(
                         source=request.source,
@@ -1461,8 +1928,11 @@ def _replay_all_auto_loaded(request: ReplayRequest, stop_event: threading.Event)
                     )
                     
                     # Replay this specific file (once)
-                    logger.info(f"🎬 Replaying {file_key}: {len(content_lines)} lines (cycle {cycle_count})")
-                    _replay_logs(source_path, individual_request, stop_event)
+                    logger.info(f"🎬 Replaying {file_key}: {file_size} bytes (cycle {cycle_count})")
+                    if await _replay_logs(source_path, individual_request, stop_event) is False:
+                        logger.warning(f"⚠️  Skipping file with no content: {file_key} (no valid lines)")
+                        skipped_count += 1
+                        continue
                     replayed_count += 1
                     
                 except Exception as e:
@@ -1470,17 +1940,17 @@ def _replay_all_auto_loaded(request: ReplayRequest, stop_event: threading.Event)
                     skipped_count += 1
                     continue
                 
-                if stop_event.is_set() or global_stop_flag.is_set():
+                if stopped():
                     logger.info("🛑 Replay all stopped by user (after file)")
                     return
                     
                 # Small delay between files  
-                time.sleep(0.5)
+                await asyncio.sleep(0.5)
                 
             logger.info(f"Completed cycle {cycle_count}: {replayed_count} replayed, {skipped_count} skipped")
             
             # Check for stop before deciding to loop the entire sequence
-            if stop_event.is_set() or global_stop_flag.is_set():
+            if stopped():
                 logger.info("🛑 Replay all stopped by user (before sequence loop decision)")
                 return
             
@@ -1501,12 +1971,12 @@ def _replay_all_auto_loaded(request: ReplayRequest, stop_event: threading.Event)
         replay_state["stop_event"] = None
         logger.info("Replay all completed and state cleaned up")
 
-def _replay_all_uploaded(request: ReplayRequest, stop_event: threading.Event):
+async def _replay_all_uploaded(request: ReplayRequest, stop_event: threading.Event):
     """Replay all uploaded files sequentially"""
+    stopped = stop_event.is_set
     try:
         # Get all uploaded files, sorted by modification time (newest first)
-        uploaded_files = list(UPLOADS_DIR.glob("*.log"))
-        uploaded_files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+        uploaded_files = _list_uploads()
         
         files_to_replay = [(f.name, str(f)) for f in uploaded_files]
         total_files = len(files_to_replay)
@@ -1516,7 +1986,7 @@ def _replay_all_uploaded(request: ReplayRequest, stop_event: threading.Event):
         
         # Handle looping at the "all files" level, not individual file level
         while True:
-            if stop_event.is_set() or global_stop_flag.is_set():
+            if stopped():
                 logger.info("🛑 Replay all uploaded stopped by user (outer loop)")
                 return
                 
@@ -1527,7 +1997,7 @@ def _replay_all_uploaded(request: ReplayRequest, stop_event: threading.Event):
             logger.info(f"🔄 Starting cycle {cycle_count} of all uploaded files")
             
             for file_index, (file_name, file_path) in enumerate(files_to_replay, 1):
-                if stop_event.is_set() or global_stop_flag.is_set():
+                if stopped():
                     logger.info("🛑 Replay all uploaded stopped by user (file loop)")
                     return
                     
@@ -1549,15 +2019,6 @@ def _replay_all_uploaded(request: ReplayRequest, stop_event: threading.Event):
                         skipped_count += 1
                         continue
                     
-                    # Quick content check
-                    with open(source_path, 'r') as f:
-                        content_lines = [line.strip() for line in f if line.strip()]
-                    
-                    if len(content_lines) == 0:
-                        logger.warning(f"⚠️  Skipping uploaded file with no content: {file_name} (no valid lines)")
-                        skipped_count += 1
-                        continue
-                    
                     # Create a modified request with loop=False for individual files
                     individual_request = ReplayRequest(
                         source=request.source,
@@ -1570,8 +2031,11 @@ def _replay_all_uploaded(request: ReplayRequest, stop_event: threading.Event):
                     )
                     
                     # Replay this specific file (once)
-                    logger.info(f"🎬 Replaying uploaded {file_name}: {len(content_lines)} lines (cycle {cycle_count})")
-                    _replay_logs(source_path, individual_request, stop_event)
+                    logger.info(f"🎬 Replaying uploaded {file_name}: {file_size} bytes (cycle {cycle_count})")
+                    if await _replay_logs(source_path, individual_request, stop_event) is False:
+                        logger.warning(f"⚠️  Skipping uploaded file with no content: {file_name} (no valid lines)")
+                        skipped_count += 1
+                        continue
                     replayed_count += 1
                     
                 except Exception as e:
@@ -1579,17 +2043,17 @@ def _replay_all_uploaded(request: ReplayRequest, stop_event: threading.Event):
                     skipped_count += 1
                     continue
                 
-                if stop_event.is_set() or global_stop_flag.is_set():
+                if stopped():
                     logger.info("🛑 Replay all uploaded stopped by user (after file)")
                     return
                     
                 # Small delay between files  
-                time.sleep(0.5)
+                await asyncio.sleep(0.5)
                 
             logger.info(f"Completed uploaded cycle {cycle_count}: {replayed_count} replayed, {skipped_count} skipped")
             
             # Check for stop before deciding to loop the entire sequence
-            if stop_event.is_set() or global_stop_flag.is_set():
+            if stopped():
                 logger.info("🛑 Replay all uploaded stopped by user (before sequence loop decision)")
                 return
             
@@ -1610,44 +2074,147 @@ def _replay_all_uploaded(request: ReplayRequest, stop_event: threading.Event):
         replay_state["stop_event"] = None # Ensure stop_event is cleared
         logger.info("Replay all uploaded completed and state cleaned up")
 
+# OTLP export: replay threads only enqueue lines; a single exporter thread
+# batches them (up to 512 records or 100ms) into one request per endpoint and
+# reuses keep-alive connections through a shared session. The queue is
+# bounded: if the collector falls behind, the oldest records are dropped so
+# the replay keeps its cadence and memory stays flat.
+_OTLP_BATCH_SIZE = 512
+_OTLP_BATCH_INTERVAL = 0.1
+_OTLP_MAX_IN_FLIGHT = 8  # concurrent POSTs (within requests' default pool of 10)
+otlp_queue = queue.Queue(maxsize=8192)  # (endpoint, timeUnixNano, line)
+otlp_session = requests.Session()
+otlp_dropped = 0  # records dropped since the exporter last reported
+
+# OTLP JSON is constant apart from each record's timestamp and body, so the
+# rest is encoded once here and the variable parts are spliced in per record
+_OTLP_ENVELOPE_HEAD, _OTLP_ENVELOPE_TAIL = orjson.dumps({
+    "resourceLogs": [{
+        "resource": {
+            "attributes": [
+                {"key": "service.name", "value": {"stringValue": "aap-mock"}}
+            ]
+        },
+        "scopeLogs": [{
+            "scope": {"name": "aap-mock"},
+            "logRecords": ["@records@"]
+        }]
+    }]
+}).split(b'"@records@"')
+_OTLP_RECORD_HEAD, _OTLP_RECORD_MIDDLE, _OTLP_RECORD_TAIL = re.split(rb'@time@|"@line@"', orjson.dumps({
+    "timeUnixNano": "@time@",
+    "body": {"stringValue": "@line@"},
+    "attributes": [
+        {"key": "source", "value": {"stringValue": "aap-mock"}}
+    ]
+}))
+
 def _send_to_otlp(line: str, endpoint: str):
-    """Send log line to OTLP endpoint"""
+    """Queue log line for batched export to OTLP endpoint"""
+    global otlp_dropped
+    record = (endpoint, str(time.time_ns()), line)
     try:
-        # Simple OTLP HTTP JSON format
-        payload = {
-            "resourceLogs": [{
-                "resource": {
-                    "attributes": [
-                        {"key": "service.name", "value": {"stringValue": "aap-mock"}}
-                    ]
-                },
-                "scopeLogs": [{
-                    "scope": {"name": "aap-mock"},
-                    "logRecords": [{
-                        "timeUnixNano": str(int(time.time() * 1e9)),
-                        "body": {"stringValue": line},
-                        "attributes": [
-                            {"key": "source", "value": {"stringValue": "aap-mock"}}
-                        ]
-                    }]
-                }]
-            }]
-        }
+        otlp_queue.put_nowait(record)
+    except queue.Full:
+        try:
+            otlp_queue.get_nowait()  # Drop the oldest record to make room
+        except queue.Empty:
+            pass
+        otlp_dropped += 1
+        try:
+            otlp_queue.put_nowait(record)
+        except queue.Full:
+            otlp_dropped += 1
+
+def _otlp_export_worker():
+    """Collect queued lines into batches and post them (daemon thread body).
+    
+    A None record asks the exporter to send what it has and exit.
+    """
+    global otlp_dropped
+    # Batches are posted from a small pool so a slow endpoint round trip doesn't
+    # hold up the next batch; the semaphore stops batching while every sender
+    # is busy, so backlog builds up in (and is dropped from) the bounded queue
+    senders = ThreadPoolExecutor(max_workers=_OTLP_MAX_IN_FLIGHT, thread_name_prefix="otlp-sender")
+    in_flight = threading.BoundedSemaphore(_OTLP_MAX_IN_FLIGHT)
+    running = True
+    while running:
+        record = otlp_queue.get()
+        if record is None:
+            break
+        batch = [record]
+        if otlp_dropped:
+            logger.warning(f"⚠️  OTLP export falling behind: dropped {otlp_dropped} log records")
+            otlp_dropped = 0
+        deadline = time.monotonic() + _OTLP_BATCH_INTERVAL
+        while len(batch) < _OTLP_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                record = otlp_queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if record is None:
+                running = False
+                break
+            batch.append(record)
+        
+        records_by_endpoint: Dict[str, List[bytes]] = {}
+        for endpoint, time_unix_nano, line in batch:
+            records_by_endpoint.setdefault(endpoint, []).append(b"".join((
+                _OTLP_RECORD_HEAD, time_unix_nano.encode(), _OTLP_RECORD_MIDDLE,
+                orjson.dumps(line), _OTLP_RECORD_TAIL
+            )))
+        for endpoint, records in records_by_endpoint.items():
+            in_flight.acquire()
+            senders.submit(_post_otlp_records, endpoint, records).add_done_callback(
+                lambda _: in_flight.release())
+    
+    senders.shutdown(wait=True)
+
+def _post_otlp_records(endpoint: str, records: List[bytes]):
+    """Send a batch of encoded log records (see _otlp_export_worker) to OTLP endpoint"""
+    try:
+        # Simple OTLP HTTP JSON format: constant envelope around the records
+        payload = b"".join((_OTLP_ENVELOPE_HEAD, b",".join(records), _OTLP_ENVELOPE_TAIL))
         
-        response = requests.post(
+        response = otlp_session.post(
             endpoint,
-            json=payload,
+            data=payload,
             headers={"Content-Type": "application/json"},
             timeout=5
         )
         response.raise_for_status()
     except Exception as e:
-        logger.warning(f"Failed to send to OTLP: {e}")
+        logger.warning(f"Failed to send {len(records)} log records to OTLP: {e}")
+
+def _stop_otlp_exporter():
+    """Send the records still queued, then close the pooled connections"""
+    try:
+        otlp_queue.put(None, timeout=5)
+        otlp_exporter.join(timeout=10)
+    except queue.Full:
+        logger.warning("⚠️  OTLP exporter did not drain before shutdown")
+    otlp_session.close()
+
+def _start_otlp_exporter():
+    """Start the exporter thread unless it is already running"""
+    global otlp_exporter
+    if otlp_exporter is None or not otlp_exporter.is_alive():
+        otlp_exporter = threading.Thread(target=_otlp_export_worker, name="otlp-exporter", daemon=True)
+        otlp_exporter.start()
+
+otlp_exporter: Optional[threading.Thread] = None
+_start_otlp_exporter()
 
 if __name__ == "__main__":
-    # Auto-load sample log files on startup
-    auto_load_sample_logs()
-    
     port = int(os.getenv("PORT", 8080))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Jobs, uploads and replay state live in process memory, so each worker
+    # has its own copy; more than one worker is opt-in for API-heavy load
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    # No per-request access log: probes and API polling would otherwise log
+    # (and format) a line for every request next to the replay output
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0", port=port, workers=workers,
+                loop="uvloop", http="httptools", access_log=False)
 
@@ -21,6 +21,7 @@ echo "💡 Drop .log or .txt files in ./sample-logs/ for auto-loading!"
 echo "Press Ctrl+C to stop the service"
 
 podman run --rm -p 8080:8080 --user $(id -u):$(id -g) \
+  -e AAP_MOCK_WRITE_FILE=1 \
   -v $(pwd)/data:/data \
   -v $(pwd)/logs:/var/log/aap-mock \
   -v $(pwd)/sample-logs:/app/sample-logs \
@@ -0,0 +1,51 @@
+"""Concurrent _store_aap_job calls keep event ids resolvable"""
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+
+def _parsed_events(count: int) -> main.JobEventColumns:
+    lines = [f"2024-01-15T10:30:{i % 60:02d}.000Z INFO [job_1:web01] TASK [step {i}] started" for i in range(count)]
+    _, events = main._parse_log_events(lines)
+    return events
+
+
+class ConcurrentStoreTest(unittest.TestCase):
+    def test_event_ids_resolve_after_concurrent_stores(self):
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+        try:
+            stored = {}  # job_id -> its JobEventColumns
+            barrier = threading.Barrier(2)
+
+            def store_jobs(prefix: str):
+                batches = [_parsed_events(1 + n % 3) for n in range(2000)]
+                barrier.wait()
+                for n, events in enumerate(batches):
+                    job_id = main._store_aap_job(None, events, f"{prefix}-{n}")
+                    stored[job_id] = events
+
+            threads = [threading.Thread(target=store_jobs, args=(prefix,)) for prefix in ("a", "b")]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        self.assertEqual(len(stored), 4000)
+        self.assertEqual(main.aap_event_id_starts, sorted(main.aap_event_id_starts))
+        for job_id, events in stored.items():
+            for index, event_id in enumerate(events.id):
+                event = main.get_job_event_detail(event_id)
+                self.assertEqual(event["id"], event_id)
+                self.assertEqual(event["uuid"], events.uuid[index])
+
+
+if __name__ == "__main__":
+    unittest.main()